@@ -0,0 +1,339 @@
+"""
+Alertas de estoque baixo/alto.
+
+- Limites mínimo/máximo por item ficam na tabela 'limites_estoque'.
+- A avaliação é incremental: só o item tocado pela movimentação é verificado,
+  dentro da mesma transação (outbox transacional em 'alertas_outbox').
+- Um dispatcher em background drena a outbox e envia para os sinks
+  configurados (arquivo de log, e-mail via SMTP, webhook), com de-duplicação
+  e back-off exponencial.
+"""
+import json
+import sqlite3
+import threading
+
+import config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS limites_estoque (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    minimo INTEGER,
+    maximo INTEGER,
+    estado TEXT NOT NULL DEFAULT 'normal', -- último nível avaliado (baixo/normal/alto)
+    UNIQUE(nome, tipo)
+);
+
+CREATE TABLE IF NOT EXISTS alertas_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    nivel TEXT CHECK(nivel IN ('baixo','normal','alto')) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    limite INTEGER,
+    status TEXT NOT NULL DEFAULT 'pendente', -- pendente/enviando/enviado/falhou/descartado
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    sinks_ok TEXT NOT NULL DEFAULT '',
+    ultimo_erro TEXT,
+    criado_em TEXT NOT NULL DEFAULT (datetime('now','localtime')),
+    proxima_tentativa TEXT NOT NULL DEFAULT (datetime('now','localtime')),
+    atualizado_em TEXT NOT NULL DEFAULT (datetime('now','localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_alertas_outbox_status
+    ON alertas_outbox(status, proxima_tentativa);
+"""
+
+
+def ensure_schema(con):
+    # Cria as tabelas de alertas (idempotente, vale também para bancos já existentes)
+    con.executescript(SCHEMA)
+
+
+# ---------- Avaliação incremental ----------
+def nivel_para(quantidade, minimo, maximo):
+    # Mesmo critério do painel: "baixo" inclui o próprio mínimo
+    if minimo is not None and quantidade <= minimo:
+        return "baixo"
+    if maximo is not None and quantidade > maximo:
+        return "alto"
+    return "normal"
+
+
+def check_item(db, nome, tipo, quantidade):
+    """
+    Avalia os limites de um único item após uma movimentação.
+    Deve ser chamada antes do commit, na mesma conexão: o alerta só
+    existe se a movimentação for efetivada.
+    Retorna o novo nível se houve cruzamento de limite, senão None.
+    """
+    row = db.execute(
+        "SELECT id, minimo, maximo, estado FROM limites_estoque WHERE nome = ? AND tipo = ?",
+        (nome, tipo)
+    ).fetchone()
+    if row is None:
+        return None
+
+    minimo, maximo, estado = row[1], row[2], row[3]
+    nivel = nivel_para(quantidade, minimo, maximo)
+    if nivel == estado:
+        # Continua do mesmo lado do limite: nada a avisar
+        return None
+
+    limite = minimo if nivel == "baixo" else maximo if nivel == "alto" else None
+    db.execute("UPDATE limites_estoque SET estado = ? WHERE id = ?", (nivel, row[0]))
+    db.execute(
+        "INSERT INTO alertas_outbox (nome, tipo, nivel, quantidade, limite) VALUES (?, ?, ?, ?, ?)",
+        (nome, tipo, nivel, quantidade, limite)
+    )
+    return nivel
+
+
+def set_limits(db, nome, tipo, minimo, maximo):
+    """
+    Grava os limites do item e recalcula o estado a partir do estoque atual,
+    sem gerar alerta (a mudança de configuração não é uma movimentação).
+    Item ainda sem registro em 'estoque' começa como 'normal': assim a
+    primeira entrada não gera um "normalizado" de um baixo nunca avisado.
+    """
+    atual = db.execute(
+        "SELECT quantidade FROM estoque WHERE nome = ? AND tipo = ?", (nome, tipo)
+    ).fetchone()
+    estado = nivel_para(atual[0], minimo, maximo) if atual else "normal"
+    db.execute(
+        """
+        INSERT INTO limites_estoque (nome, tipo, minimo, maximo, estado) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(nome, tipo) DO UPDATE SET
+            minimo = excluded.minimo, maximo = excluded.maximo, estado = excluded.estado
+        """,
+        (nome, tipo, minimo, maximo, estado)
+    )
+
+
+def format_message(alerta):
+    # Texto único usado por todos os sinks
+    if alerta["nivel"] == "baixo":
+        return (f"Estoque baixo: {alerta['nome']} ({alerta['tipo']}) com "
+                f"{alerta['quantidade']} unidade(s), mínimo {alerta['limite']}.")
+    if alerta["nivel"] == "alto":
+        return (f"Estoque acima do máximo: {alerta['nome']} ({alerta['tipo']}) com "
+                f"{alerta['quantidade']} unidade(s), máximo {alerta['limite']}.")
+    return (f"Estoque normalizado: {alerta['nome']} ({alerta['tipo']}) com "
+            f"{alerta['quantidade']} unidade(s).")
+
+
+# ---------- Sinks ----------
+class LogSink:
+    """Acrescenta uma linha por alerta em um arquivo de log."""
+    name = "log"
+
+    def __init__(self, path=None):
+        self.path = path or config.ALERT_LOG_FILE
+
+    def send(self, alerta):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"{alerta['criado_em']} [{alerta['nivel']}] {format_message(alerta)}\n")
+
+
+class EmailSink:
+    """Envia o alerta por e-mail via servidor SMTP (ex.: relay local)."""
+    name = "email"
+
+    def __init__(self, host=None, port=None, sender=None, recipients=None):
+        self.host = host or config.ALERT_SMTP_HOST
+        self.port = port or config.ALERT_SMTP_PORT
+        self.sender = sender or config.ALERT_EMAIL_FROM
+        self.recipients = recipients or config.ALERT_EMAIL_TO
+
+    def send(self, alerta):
+        # Import tardio: smtplib/email pesam no boot e só são usados aqui
+        import smtplib
+        from email.message import EmailMessage
+
+        if not self.recipients:
+            raise RuntimeError("Nenhum destinatário configurado (KEEPER_ALERT_EMAIL_TO)")
+        msg = EmailMessage()
+        msg["Subject"] = f"[Keeper] Estoque {alerta['nivel']}: {alerta['nome']}"
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(self.recipients)
+        msg.set_content(format_message(alerta))
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(msg)
+
+
+class WebhookSink:
+    """Faz POST do alerta em JSON para uma URL."""
+    name = "webhook"
+
+    def __init__(self, url=None):
+        self.url = url or config.ALERT_WEBHOOK_URL
+
+    def send(self, alerta):
+        import urllib.request  # import tardio (puxa http.client/ssl)
+
+        if not self.url:
+            raise RuntimeError("URL do webhook não configurada (KEEPER_ALERT_WEBHOOK_URL)")
+        payload = {k: alerta[k] for k in ("id", "nome", "tipo", "nivel", "quantidade", "limite", "criado_em")}
+        payload["mensagem"] = format_message(alerta)
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            if resp.status >= 300:
+                raise RuntimeError(f"Webhook respondeu HTTP {resp.status}")
+
+
+# Registro de sinks disponíveis (nome -> fábrica sem argumentos)
+SINKS = {
+    "log": LogSink,
+    "email": EmailSink,
+    "webhook": WebhookSink,
+}
+
+
+def register_sink(name, factory):
+    # Permite plugar novos destinos sem mexer no dispatcher
+    SINKS[name] = factory
+
+
+def build_sinks(names):
+    sinks = []
+    for name in names:
+        if name not in SINKS:
+            raise ValueError(f"Sink de alerta desconhecido: {name}")
+        sinks.append(SINKS[name]())
+    return sinks
+
+
+# ---------- Dispatcher ----------
+class AlertDispatcher(threading.Thread):
+    """
+    Thread que drena 'alertas_outbox' periodicamente.
+    Cada alerta é "reservado" com UPDATE condicional, então vários workers
+    podem rodar o dispatcher ao mesmo tempo sem enviar em duplicidade.
+    """
+
+    def __init__(self, db_path, sinks, interval=None, max_attempts=None, backoff=None, batch_size=50):
+        super().__init__(name="keeper-alerts", daemon=True)
+        self.db_path = db_path
+        self.sinks = sinks
+        self.interval = interval if interval is not None else config.ALERT_POLL_SECONDS
+        self.max_attempts = max_attempts if max_attempts is not None else config.ALERT_MAX_ATTEMPTS
+        self.backoff = backoff if backoff is not None else config.ALERT_BACKOFF_SECONDS
+        self.batch_size = batch_size
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.drain()
+            except Exception as e:
+                # Nunca deixa a thread morrer por erro transitório (ex.: banco bloqueado)
+                print(f"Dispatcher de alertas: erro ao drenar outbox: {e}")
+
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def drain(self):
+        """Processa um lote de alertas pendentes. Retorna quantos foram enviados."""
+        con = self._connect()
+        enviados = 0
+        try:
+            # Recupera reservas órfãs (worker que morreu no meio do envio)
+            con.execute(
+                "UPDATE alertas_outbox SET status = 'pendente' "
+                "WHERE status = 'enviando' AND atualizado_em < datetime('now','localtime','-5 minutes')"
+            )
+            con.commit()
+
+            rows = con.execute(
+                "SELECT id FROM alertas_outbox "
+                "WHERE status = 'pendente' AND proxima_tentativa <= datetime('now','localtime') "
+                "ORDER BY id LIMIT ?",
+                (self.batch_size,)
+            ).fetchall()
+
+            for r in rows:
+                if self._process(con, r["id"]):
+                    enviados += 1
+        finally:
+            con.close()
+        return enviados
+
+    def _process(self, con, alerta_id):
+        cur = con.execute(
+            "UPDATE alertas_outbox SET status = 'enviando', atualizado_em = datetime('now','localtime') "
+            "WHERE id = ? AND status = 'pendente'",
+            (alerta_id,)
+        )
+        con.commit()
+        if cur.rowcount == 0:
+            return False  # outro worker pegou primeiro
+
+        alerta = con.execute("SELECT * FROM alertas_outbox WHERE id = ?", (alerta_id,)).fetchone()
+
+        # De-duplicação: descarta só o que ficou obsoleto por um alerta mais novo
+        # do mesmo item -- o mesmo nível repetido, ou um "normalizado" já superado.
+        # Um aviso de baixo/alto nunca é trocado por um "normalizado" posterior.
+        mais_novo = con.execute(
+            "SELECT 1 FROM alertas_outbox WHERE nome = ? AND tipo = ? AND id > ? "
+            "AND status IN ('pendente','enviando','enviado') AND (nivel = ? OR ? = 'normal') LIMIT 1",
+            (alerta["nome"], alerta["tipo"], alerta_id, alerta["nivel"], alerta["nivel"])
+        ).fetchone()
+        if mais_novo:
+            con.execute(
+                "UPDATE alertas_outbox SET status = 'descartado', atualizado_em = datetime('now','localtime') WHERE id = ?",
+                (alerta_id,)
+            )
+            con.commit()
+            return False
+
+        # Sinks que já receberam numa tentativa anterior não recebem de novo
+        ok = set(filter(None, alerta["sinks_ok"].split(",")))
+        erros = []
+        for sink in self.sinks:
+            if sink.name in ok:
+                continue
+            try:
+                sink.send(alerta)
+                ok.add(sink.name)
+            except Exception as e:
+                erros.append(f"{sink.name}: {e}")
+
+        if not erros:
+            con.execute(
+                "UPDATE alertas_outbox SET status = 'enviado', sinks_ok = ?, ultimo_erro = NULL, "
+                "atualizado_em = datetime('now','localtime') WHERE id = ?",
+                (",".join(sorted(ok)), alerta_id)
+            )
+            con.commit()
+            return True
+
+        tentativas = alerta["tentativas"] + 1
+        status = "falhou" if tentativas >= self.max_attempts else "pendente"
+        espera = self.backoff * (2 ** (tentativas - 1))
+        con.execute(
+            "UPDATE alertas_outbox SET status = ?, tentativas = ?, sinks_ok = ?, ultimo_erro = ?, "
+            "proxima_tentativa = datetime('now','localtime', ?), atualizado_em = datetime('now','localtime') "
+            "WHERE id = ?",
+            (status, tentativas, ",".join(sorted(ok)), "; ".join(erros), f"+{espera} seconds", alerta_id)
+        )
+        con.commit()
+        return False
+
+
+def start_dispatcher(db_path):
+    # Inicia o dispatcher com os sinks definidos em config.ALERT_SINKS
+    dispatcher = AlertDispatcher(db_path, build_sinks(config.ALERT_SINKS))
+    dispatcher.start()
+    return dispatcher
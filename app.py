@@ -1,44 +1,216 @@
+import time
+_T_IMPORT = time.perf_counter()  # início dos imports (relatório de startup)
 import os
 import sqlite3
+import threading
 from pathlib import Path
 from functools import wraps
+from datetime import date, timedelta
+from concurrent.futures import TimeoutError as FutureTimeout
+import click
 from flask import (
-    Flask, g, render_template, request, redirect, url_for, flash, session, abort
+    Flask, g, current_app, render_template, request, redirect, url_for, flash, session, abort
 )
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.security import generate_password_hash, check_password_hash
 import config 
+import alerts
+import movements
+import sites
+import profiling
+import backup
+import reports
+import catalog
 
 # Caminho raiz da aplicação (pasta onde está o app.py)
 APP_DIR = Path(__file__).parent
 
+# Tempo gasto importando flask/jinja/módulos do Keeper (uma vez por processo)
+IMPORT_MS = (time.perf_counter() - _T_IMPORT) * 1000
+
 
 # ---------- Factory da aplicação ----------
 def create_app():
     # Cria a instância principal do Flask
+    t_inicio = time.perf_counter()
     app = Flask(__name__)
+
+    # Bytecode dos templates em disco: workers novos não recompilam o Jinja
+    if config.TEMPLATE_CACHE_DIR:
+        Path(config.TEMPLATE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        app.jinja_options = {
+            **app.jinja_options,
+            "bytecode_cache": FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR),
+        }
     
     app.config["DATABASE"] = config.DB_FILE
     app.secret_key = config.SECRET_KEY
 
     app.config['VERSION'] = '1.0.0'
 
+    # Multi-site: um banco por site (KEEPER_SITES); sem sites, banco único
+    databases = config.SITES or {"default": app.config["DATABASE"]}
+
     @app.context_processor
     def inject_version():
-        return dict(version=app.config['VERSION'])
+        return dict(version=app.config['VERSION'], multi_site=bool(config.SITES))
 
-    # Inicializa o banco dentro do contexto da aplicação
+    # Inicializa o(s) banco(s) dentro do contexto da aplicação
+    t = time.perf_counter()
     with app.app_context():
-        init_db(app.config["DATABASE"])
+        for db_path in databases.values():
+            init_db(db_path)
+    timings = {"imports": IMPORT_MS, "init_db": (time.perf_counter() - t) * 1000}
+
+    if config.SITES:
+        router = sites.SiteRouter(config.SITES, config.SITE_MODE, config.DEFAULT_SITE)
+        app.extensions["site_router"] = router
+        if router.mode == "prefix":
+            app.wsgi_app = router.wsgi_middleware(app.wsgi_app)
+
+    # Profiling sob demanda (antes das rotas, para envolver a requisição inteira)
+    profiling.RequestProfiler(app)
 
     # Registra as rotas (função separada para manter o código organizado)
+    t = time.perf_counter()
     register_routes(app)
+    register_commands(app)
+    timings["rotas"] = (time.perf_counter() - t) * 1000
+
+    # Carrega os templates já no boot (com o bytecode cache, só lê do disco)
+    if config.TEMPLATE_WARMUP:
+        t = time.perf_counter()
+        precompile_templates(app)
+        timings["templates"] = (time.perf_counter() - t) * 1000
+
+    # Threads de fundo (alertas, writer, backup): só na primeira requisição
+    # de cada processo. Nunca no import/CLI nem no master do gunicorn --preload
+    app.config["DATABASES"] = databases
+    app.before_request(lambda: start_background(app))
+
+    # Pool só leitura para relatórios/exportações (um por site)
+    app.extensions["report_pools"] = {
+        site: sites.ConnectionPool(path, config.REPORT_POOL_SIZE, read_only=True)
+        for site, path in databases.items()
+    }
+
+    timings["create_app"] = (time.perf_counter() - t_inicio) * 1000
+    app.config["STARTUP_TIMINGS"] = timings
+    if config.STARTUP_REPORT:
+        print("Startup (pid %d): %s" % (
+            os.getpid(), " | ".join(f"{k} {v:.1f}ms" for k, v in timings.items())
+        ))
     return app
 
 
+_BACKGROUND_LOCK = threading.Lock()
+
+
+def start_background(app):
+    """
+    Inicia as threads de fundo uma vez por processo (chave: os.getpid()).
+    Threads não sobrevivem ao fork: um worker criado a partir de um master
+    que já tinha as threads sobe as suas na primeira requisição.
+    """
+    pid = os.getpid()
+    if app.extensions.get("background_pid") == pid:
+        return
+    with _BACKGROUND_LOCK:
+        if app.extensions.get("background_pid") == pid:
+            return
+        databases = app.config["DATABASES"]
+
+        # Dispatcher de alertas de estoque (opcional, via KEEPER_ALERTS=1), um por site.
+        # O que foi para a outbox antes desta requisição é enviado agora
+        if config.ALERTS_ENABLED:
+            app.extensions["alert_dispatchers"] = {
+                site: alerts.start_dispatcher(path) for site, path in databases.items()
+            }
+
+        # Writer único de movimentações (opcional, via KEEPER_WRITE_QUEUE=1), um por site
+        if config.WRITE_QUEUE_ENABLED:
+            app.extensions["movement_writers"] = {
+                site: movements.start_writer(path) for site, path in databases.items()
+            }
+
+        # Backup online agendado (opcional, via KEEPER_BACKUP=1); a trava de
+        # arquivo faz só um dos workers copiar
+        if config.BACKUP_ENABLED:
+            app.extensions["backup_scheduler"] = backup.start_scheduler(databases)
+
+        app.extensions["background_pid"] = pid
+
+
+def precompile_templates(app):
+    """
+    Compila todos os templates HTML. Com o bytecode cache ligado, o
+    resultado fica em disco e é reaproveitado por todos os workers.
+    """
+    nomes = [n for n in app.jinja_env.list_templates() if n.endswith(".html")]
+    for nome in nomes:
+        app.jinja_env.get_template(nome)
+    return nomes
+
+
+# ---------- Comandos de linha (flask --app app <comando>) ----------
+def register_commands(app):
+
+    @app.cli.command("precompile-templates")
+    def precompile_templates_command():
+        """Compila os templates no bytecode cache (rodar no deploy)."""
+        if not config.TEMPLATE_CACHE_DIR:
+            print("Bytecode cache desligado (KEEPER_TEMPLATE_CACHE vazio).")
+            return
+        t = time.perf_counter()
+        nomes = precompile_templates(app)
+        print(f"{len(nomes)} templates compilados em {config.TEMPLATE_CACHE_DIR} "
+              f"({(time.perf_counter() - t) * 1000:.1f}ms)")
+
+    @app.cli.command("backup")
+    @click.option("--site", default=None, help="Só este site (padrão: todos).")
+    def backup_command(site):
+        """Faz backup online agora (API de backup do SQLite)."""
+        for nome, db_path in _cli_databases(site).items():
+            final = backup.backup_database(db_path, prefix=nome)
+            print(f"Backup de {nome} gravado em {final}")
+
+    @app.cli.command("restore")
+    @click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--site", default=None, help="Site a restaurar (obrigatório com KEEPER_SITES).")
+    @click.option("--yes", is_flag=True, help="Não pedir confirmação.")
+    def restore_command(arquivo, site, yes):
+        """Restaura um backup (.db ou .db.gz) sobre o banco."""
+        if config.SITES and not site:
+            raise click.UsageError("Informe --site ao usar KEEPER_SITES.")
+        (nome, db_path), = _cli_databases(site).items()
+        if not yes:
+            click.confirm(f"Substituir o banco {db_path} pelo backup {arquivo}?", abort=True)
+        try:
+            backup.restore_database(arquivo, db_path)
+        except backup.BackupError as e:
+            raise click.ClickException(f"Backup inválido, nada foi alterado: {e}")
+        print(f"Banco {nome} restaurado a partir de {arquivo}")
+
+    @app.cli.command("startup-report")
+    def startup_report_command():
+        """
+        Mostra quanto tempo cada etapa do boot levou no próprio processo do
+        comando (um boot a frio novo), não nos workers já em execução; para
+        esses, use KEEPER_STARTUP_REPORT=1.
+        """
+        for etapa, ms in app.config["STARTUP_TIMINGS"].items():
+            print(f"{etapa:<12} {ms:8.1f}ms")
+
+
 # ---------- Helpers do banco de dados ----------
 def get_db():
     # Retorna a conexão atual, ou cria uma nova se ainda não existir
     if "db" not in g:
+        router = current_app.extensions.get("site_router")
+        if router is not None:
+            # Multi-site: conexão emprestada do pool do site da requisição
+            g.db = router.acquire(current_site())
+            return g.db
         con = sqlite3.connect(current_db_path())
         con.row_factory = sqlite3.Row  # Permite acessar colunas por nome
         con.execute("PRAGMA foreign_keys = ON;")  # Garante integridade referencial
@@ -46,10 +218,23 @@ def get_db():
     return g.db
 
 def close_db(e=None):
-    # Fecha a conexão com o banco no fim da requisição
+    # Fecha a conexão com o banco no fim da requisição (ou devolve ao pool do site)
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        router = current_app.extensions.get("site_router")
+        if router is not None:
+            router.release(g.site, db)
+        else:
+            db.close()
+
+def current_site():
+    # Site da requisição atual ("default" no modo de banco único)
+    router = current_app.extensions.get("site_router")
+    if router is None:
+        return "default"
+    if "site" not in g:
+        g.site = router.resolve(request, session)
+    return g.site
 
 def current_db_path():
     # Retorna o caminho do banco, priorizando variável de ambiente
@@ -86,6 +271,15 @@ def init_db(db_path):
             conn.executescript(f.read())
         print(f"Banco inicializado com sucesso usando {schema_file} em {db_path}")
 
+    # Tabelas dos módulos adicionais (idempotente, também para bancos já existentes)
+    conn = sqlite3.connect(db_path)
+    try:
+        # WAL: leituras longas (relatórios, backup) não bloqueiam as movimentações
+        conn.execute("PRAGMA journal_mode=WAL;")
+        alerts.ensure_schema(conn)
+    finally:
+        conn.close()
+
 
 # ---------- Helpers de autenticação ----------
 def login_required(view):
@@ -94,7 +288,11 @@ def login_required(view):
     def wrapped_view(*args, **kwargs):
         if "user_id" not in session:
             # Redireciona pro login e guarda a rota original
-            return redirect(url_for("login", next=request.path))
+            return redirect(url_for("login", next=request.script_root + request.path))
+        if session.get("site", "default") != current_site():
+            # Sessão aberta em outro site: o user_id não vale neste banco
+            session.clear()
+            return redirect(url_for("login", next=request.script_root + request.path))
         return view(*args, **kwargs)
     return wrapped_view
 
@@ -145,6 +343,14 @@ def first_login_required(view):
 
         return view(*args, **kwargs)
     return wrapped_view
+def _cli_databases(site=None):
+    # Bancos alvo dos comandos de linha ({site: caminho})
+    databases = config.SITES or {"default": config.DB_FILE}
+    if site is None:
+        return databases
+    if site not in databases:
+        raise click.BadParameter(f"Site desconhecido: {site}", param_hint="--site")
+    return {site: databases[site]}
 
 # ---------- Rotas ----------
 def register_routes(app):
@@ -163,11 +369,25 @@ def register_routes(app):
         if request.method == "POST":
             username = request.form.get("username", "").strip()
             password = request.form.get("password", "")
-            db = get_db()
 
-            row = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+            router = current_app.extensions.get("site_router")
+            if router is not None and router.mode == "user":
+                # Multi-site por usuário: o site é o banco em que usuário e senha conferem
+                try:
+                    site, row = router.authenticate(username, password, request.form.get("site"))
+                except sites.AmbiguousLogin:
+                    flash("Este usuário existe em mais de um site. Escolha o site para entrar.", "warning")
+                    return render_template("login.html", login_sites=list(router.sites),
+                                           username=username)
+                if site is not None:
+                    g.site = site
+            else:
+                db = get_db()
+                row = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+                if row is not None and not check_password_hash(row["password_hash"], password):
+                    row = None
 
-            if row is None or not check_password_hash(row["password_hash"], password):
+            if row is None:
                 flash("Usuário ou senha inválidos.", "danger")
                 return redirect(url_for("login"))
 
@@ -176,11 +396,15 @@ def register_routes(app):
             session["user_id"] = row["id"]
             session["username"] = row["username"]
             session["role"] = row["role"]
+            session["site"] = current_site()
 
             next_page = request.args.get("next") or url_for("dashboard")
             return redirect(next_page)
 
-        return render_template("login.html")
+        # Modo 'user': o campo de site é opcional e só serve para contas em vários sites
+        router = current_app.extensions.get("site_router")
+        login_sites = list(router.sites) if router is not None and router.mode == "user" else None
+        return render_template("login.html", login_sites=login_sites)
 
     @app.route("/logout")
     @login_required
@@ -427,7 +651,12 @@ def register_routes(app):
         offset = (page - 1) * per_page
 
         rows = db.execute(
-            "SELECT * FROM itens ORDER BY nome LIMIT ? OFFSET ?",
+            """
+            SELECT i.*, l.minimo, l.maximo
+            FROM itens i
+            LEFT JOIN limites_estoque l ON l.nome = i.nome AND l.tipo = i.tipo
+            ORDER BY i.nome LIMIT ? OFFSET ?
+            """,
             (per_page, offset)
         ).fetchall()
 
@@ -439,6 +668,75 @@ def register_routes(app):
         }
 
         return render_template("itens.html", itens=rows, pagination=pagination)
+
+    @app.route("/itens/importar", methods=["POST"])
+    @login_required
+    @first_login_required
+    def importar_itens():
+        """Importa itens em lote de um .xlsx/.csv (colunas: nome, tipo, descricao)."""
+        return importar_catalogo("itens")
+
+    @app.route("/localizacoes/importar", methods=["POST"])
+    @login_required
+    @first_login_required
+    def importar_localizacoes():
+        """Importa localizações em lote de um .xlsx/.csv (colunas: nome, descricao)."""
+        return importar_catalogo("localizacoes")
+
+    def importar_catalogo(tabela):
+        current_user = get_current_user()
+        if current_user["role"] != "admin":
+            flash("Acesso negado.", "danger")
+            return redirect(url_for("index"))
+
+        arquivo = request.files.get("arquivo")
+        if not arquivo or not arquivo.filename:
+            flash("Selecione um arquivo .xlsx ou .csv.", "warning")
+            return redirect(url_for(tabela))
+
+        db = get_db()
+        try:
+            linhas = catalog.read_rows(arquivo.stream, arquivo.filename, tabela)
+            resumo = catalog.import_rows(db, tabela, linhas)
+        except catalog.CatalogImportError as e:
+            flash(str(e), "danger")
+            return redirect(url_for(tabela))
+
+        categoria = "warning" if resumo["invalidos"] else "success"
+        flash(catalog.summary_message(resumo), categoria)
+        return redirect(url_for(tabela, page=1))
+
+    @app.route("/itens/<int:item_id>/limites", methods=["POST"])
+    @login_required
+    @first_login_required
+    def definir_limites(item_id):
+        """Define estoque mínimo/máximo do item (campos vazios = sem limite)."""
+        current_user = get_current_user()
+        if current_user["role"] != "admin":
+            flash("Acesso negado.", "danger")
+            return redirect(url_for("index"))
+
+        db = get_db()
+        page = request.form.get("page", 1, type=int)
+        item = db.execute("SELECT nome, tipo FROM itens WHERE id = ?", (item_id,)).fetchone()
+        if not item:
+            flash("Item não encontrado.", "warning")
+            return redirect(url_for("itens", page=page))
+
+        try:
+            minimo = int(request.form["minimo"]) if request.form.get("minimo", "").strip() else None
+            maximo = int(request.form["maximo"]) if request.form.get("maximo", "").strip() else None
+        except ValueError:
+            minimo = maximo = -1
+        if (minimo is not None and minimo < 0) or (maximo is not None and maximo < 0) \
+                or (minimo is not None and maximo is not None and maximo < minimo):
+            flash("Limites inválidos.", "warning")
+            return redirect(url_for("itens", page=page))
+
+        alerts.set_limits(db, item["nome"], item["tipo"], minimo, maximo)
+        db.commit()
+        flash(f"Limites de {item['nome']} atualizados.", "success")
+        return redirect(url_for("itens", page=page))
    
     @app.route("/excluir_item/<int:item_id>", methods=["POST"])
     @login_required
@@ -456,8 +754,9 @@ def register_routes(app):
         if item:
             nome, tipo = item["nome"], item["tipo"]
 
-            # Deletar do estoque
+            # Deletar do estoque e dos limites de alerta
             db.execute("DELETE FROM estoque WHERE nome = ? AND tipo = ?", (nome, tipo))
+            db.execute("DELETE FROM limites_estoque WHERE nome = ? AND tipo = ?", (nome, tipo))
 
             # Deletar do itens
             db.execute("DELETE FROM itens WHERE id = ?", (item_id,))
@@ -557,9 +856,12 @@ def register_routes(app):
                 e.nome,
                 e.tipo,
                 e.quantidade,
-                i.descricao
+                i.descricao,
+                l.minimo,
+                l.maximo
             FROM estoque e
             LEFT JOIN itens i ON e.nome = i.nome
+            LEFT JOIN limites_estoque l ON l.nome = e.nome AND l.tipo = e.tipo
             ORDER BY 
                 CASE 
                     WHEN e.tipo = 'Toner' THEN 1
@@ -628,40 +930,24 @@ def register_routes(app):
             nome = item_row["nome"]
             tipo = item_row["tipo"]  # <-- tipo determinado pelo catálogo, NÃO pelo form
 
-            # atualiza estoque: se existe o registro, atualiza; se não existe e for entrada, cria
-            row = db.execute(
-                "SELECT id, quantidade FROM estoque WHERE nome = ? AND tipo = ?",
-                (nome, tipo)
-            ).fetchone()
-
-            if row:
-                # calcula nova quantidade dependendo do tipo de movimento
-                if movimento == "entrada":
-                    nova_qtd = row["quantidade"] + quantidade
-                else:  # saida
-                    nova_qtd = row["quantidade"] - quantidade
-
-                if nova_qtd < 0:
-                    flash("Não há estoque suficiente para esta saída.", "danger")
-                    return redirect(url_for("movimentacao"))
-
-                db.execute("UPDATE estoque SET quantidade = ? WHERE id = ?", (nova_qtd, row["id"]))
-            else:
-                # não existe registro no estoque
-                if movimento == "saida":
-                    flash("Não há estoque desse item.", "danger")
-                    return redirect(url_for("movimentacao"))
-                db.execute(
-                    "INSERT INTO estoque (nome, tipo, quantidade) VALUES (?, ?, ?)",
-                    (nome, tipo, quantidade)
-                )
+            writer = current_app.extensions.get("movement_writers", {}).get(current_site())
+            try:
+                if writer is not None:
+                    # modo single-writer: espera o lote em que entrou ser gravado
+                    writer.apply(nome, tipo, quantidade, movimento, usuario, local_nome,
+                                 timeout=config.WRITE_QUEUE_TIMEOUT)
+                else:
+                    movements.apply_movement(db, nome, tipo, quantidade, movimento, usuario, local_nome)
+                    db.commit()
+            except movements.InsufficientStock as e:
+                db.rollback()
+                flash(str(e), "danger")
+                return redirect(url_for("movimentacao"))
+            except (FutureTimeout, sqlite3.OperationalError):
+                db.rollback()
+                flash("Banco ocupado, movimentação não registrada. Tente novamente.", "danger")
+                return redirect(url_for("movimentacao"))
 
-            # registra movimentação (guarda nome/tipo pra audit trail)
-            db.execute(
-                "INSERT INTO movimentacao (nome, tipo, quantidade, movimento, usuario, localizacao) VALUES (?, ?, ?, ?, ?, ?)",
-                (nome, tipo, quantidade, movimento, usuario, local_nome)
-            )
-            db.commit()
             flash(f"Movimentação registrada: {movimento} de {quantidade}x {nome} ({tipo})" + (f" - Local: {local_nome}" if local_nome else ""), "success")
             return redirect(url_for("movimentacao"))
 
@@ -709,6 +995,7 @@ def register_routes(app):
                 return redirect(url_for("movimentacao"))
 
             db.execute("UPDATE estoque SET quantidade = ? WHERE id = ?", (nova_qtd, estoque["id"]))
+            alerts.check_item(db, mov["nome"], mov["tipo"], nova_qtd)
         else:
             # se não existe registro de estoque:
             # - se a movimentação era saída, não conseguimos restaurar (erro)
@@ -729,8 +1016,12 @@ def register_routes(app):
     @login_required
     @first_login_required
     def relatorio_entrada_saida():
-        """Relatório de movimentações com filtros, paginação e exportação Excel"""
-        db = get_db()
+        """
+        Relatório de movimentações com filtros, paginação e exportação Excel.
+        As queries rodam no pool só leitura, com tempo limitado
+        (KEEPER_REPORT_BUDGET / KEEPER_EXPORT_BUDGET).
+        """
+        report_pool = current_app.extensions["report_pools"][current_site()]
         filtros = []
         params = []
 
@@ -764,13 +1055,24 @@ def register_routes(app):
             from flask import send_file
             from io import BytesIO
 
+            try:
+                # Só a leitura fica no snapshot: a planilha é montada depois,
+                # sem segurar a transação de leitura
+                with reports.read_snapshot(report_pool, config.EXPORT_TIME_BUDGET) as rdb:
+                    movimentacoes = rdb.execute(query_base, params).fetchall()
+            except reports.ReportTimeout as e:
+                flash(f"Exportação cancelada ({e}). Reduza o período e tente novamente.", "warning")
+                return redirect(url_for(
+                    "relatorio_entrada_saida", movimento=movimento, data_inicio=data_inicio, data_fim=data_fim
+                ))
+
             wb = Workbook()
             ws = wb.active
             ws.title = "Movimentações"
 
             # Cabeçalho
             ws.append(["DataHora", "Item", "Tipo", "Quantidade", "Movimento", "Usuário", "Localização"])
-            for m in db.execute(query_base, params).fetchall():
+            for m in movimentacoes:
                 ws.append([
                     m["datahora"],
                     m["nome"],
@@ -778,7 +1080,7 @@ def register_routes(app):
                     m["quantidade"],
                     m["movimento"],
                     m["usuario"],
-                    m.get("localizacao", "") if isinstance(m, dict) or hasattr(m, "keys") else m[6] if len(m) > 6 else ""
+                    m["localizacao"] or ""
                 ])
 
             output = BytesIO()
@@ -798,19 +1100,26 @@ def register_routes(app):
         per_page = 10
         offset = (page - 1) * per_page
 
-        # Total com os mesmos filtros => usamos subquery com alias para compatibilidade
-        count_query = "SELECT COUNT(*) AS total FROM (" + query_base + ") AS subq"
-        total_row = db.execute(count_query, params).fetchone()
-        total = total_row["total"] if (hasattr(total_row, "keys") or isinstance(total_row, dict)) else total_row[0]
-        total_pages = (total + per_page - 1) // per_page
-        if total_pages > 0 and page > total_pages:
-            page = total_pages
-            offset = (page - 1) * per_page
-
-        # Busca páginas com LIMIT/OFFSET
-        paged_query = query_base + " LIMIT ? OFFSET ?"
-        paged_params = params + [per_page, offset]
-        movimentacoes = db.execute(paged_query, paged_params).fetchall()
+        try:
+            # Total e página no mesmo snapshot: contagem e linhas sempre batem
+            with reports.read_snapshot(report_pool, config.REPORT_TIME_BUDGET) as rdb:
+                # Total com os mesmos filtros => usamos subquery com alias para compatibilidade
+                count_query = "SELECT COUNT(*) AS total FROM (" + query_base + ") AS subq"
+                total_row = rdb.execute(count_query, params).fetchone()
+                total = total_row["total"] if (hasattr(total_row, "keys") or isinstance(total_row, dict)) else total_row[0]
+                total_pages = (total + per_page - 1) // per_page
+                if total_pages > 0 and page > total_pages:
+                    page = total_pages
+                    offset = (page - 1) * per_page
+
+                # Busca páginas com LIMIT/OFFSET
+                paged_query = query_base + " LIMIT ? OFFSET ?"
+                paged_params = params + [per_page, offset]
+                movimentacoes = rdb.execute(paged_query, paged_params).fetchall()
+        except reports.ReportTimeout as e:
+            # Renderiza vazio (sem redirect, para não repetir a mesma query pesada)
+            flash(f"Relatório cancelado ({e}). Refine os filtros, por exemplo com um período menor.", "warning")
+            movimentacoes, total, total_pages = [], 0, 0
 
         pagination = {
             "page": page,
@@ -828,6 +1137,51 @@ def register_routes(app):
             pagination=pagination
         )
 
+    @app.route("/consolidado")
+    @login_required
+    @first_login_required
+    def consolidado():
+        """Estoque atual e consumo (saídas) de todos os sites, lado a lado."""
+        router = current_app.extensions.get("site_router")
+        if router is None:
+            abort(404)
+        current_user = get_current_user()
+        if current_user["role"] != "admin":
+            flash("Acesso negado.", "danger")
+            return redirect(url_for("index"))
+
+        hoje = date.today()
+        data_inicio = request.args.get("data_inicio") or (hoje - timedelta(days=30)).isoformat()
+        data_fim = request.args.get("data_fim") or hoje.isoformat()
+
+        linhas, erros = router.aggregate(data_inicio, data_fim)
+        for site, erro in erros.items():
+            flash(f"Site {site} indisponível: {erro}", "warning")
+
+        return render_template(
+            "consolidado.html",
+            linhas=linhas,
+            sites=list(router.sites),
+            data_inicio=data_inicio,
+            data_fim=data_fim
+        )
+
+    @app.route("/perfis")
+    @login_required
+    @first_login_required
+    def perfis():
+        """Requisições perfiladas mais lentas, com as funções que mais gastaram tempo."""
+        current_user = get_current_user()
+        if current_user["role"] != "admin":
+            flash("Acesso negado.", "danger")
+            return redirect(url_for("index"))
+
+        profiler = current_app.extensions["profiler"]
+        return render_template(
+            "perfis.html",
+            perfis=profiler.slowest(),
+            diretorio=profiler.directory
+        )
 
 
 # ---------- Execução ----------
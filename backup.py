@@ -0,0 +1,223 @@
+"""
+Backup online do banco usando a API de backup do SQLite.
+
+A cópia é feita em passos de poucas páginas, com pausa entre eles, então
+as escritas de movimentação nunca ficam bloqueadas por muito tempo (nada
+de cópia de arquivo "rasgada"). Cada backup terminado passa por
+PRAGMA integrity_check, é opcionalmente comprimido (gzip) e os antigos
+são rotacionados.
+"""
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+
+class BackupError(Exception):
+    """Backup ou restauração que não passou na verificação."""
+
+
+def _check_integrity(con):
+    try:
+        resultado = con.execute("PRAGMA integrity_check").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"arquivo não é um banco SQLite válido: {e}")
+    if resultado != "ok":
+        raise BackupError(f"integrity_check falhou: {resultado}")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(src, dst, pages, step_sleep, max_restarts=None):
+    """
+    Copia em passos de 'pages' páginas com pausa entre eles.
+    Escrita de outra conexão no meio faz o SQLite recomeçar a cópia; se
+    isso acontecer mais de 'max_restarts' vezes (movimento intenso), faz
+    uma última passada num passo só, que não tem como ser interrompida.
+    Como um recomeço logo após o primeiro passo não faz o progresso
+    diminuir, há também um teto de passos equivalente a max_restarts + 1
+    cópias completas.
+    """
+    max_restarts = config.BACKUP_MAX_RESTARTS if max_restarts is None else max_restarts
+    estado = {"copiadas": 0, "reinicios": 0, "passos": 0}
+
+    def progress(status, remaining, total):
+        copiadas = total - remaining
+        estado["passos"] += 1
+        max_passos = (max_restarts + 1) * -(-total // pages)
+        if remaining and copiadas <= estado["copiadas"]:
+            estado["reinicios"] += 1
+        if estado["reinicios"] > max_restarts or (remaining and estado["passos"] >= max_passos):
+            raise _TooManyRestarts()
+        estado["copiadas"] = copiadas
+        # Pausa entre os passos: libera o banco para os writers
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+
+    try:
+        src.backup(dst, pages=pages, progress=progress)
+    except _TooManyRestarts:
+        src.backup(dst, pages=-1)
+
+
+def backup_database(db_path, dest_dir=None, prefix="default", pages=None, step_sleep=None,
+                    compress=None, keep=None):
+    """
+    Faz um backup online de db_path em dest_dir e devolve o caminho final.
+    O arquivo só aparece com o nome definitivo depois de verificado.
+    """
+    dest_dir = Path(dest_dir or config.BACKUP_DIR)
+    pages = pages or config.BACKUP_PAGES
+    step_sleep = config.BACKUP_STEP_SLEEP if step_sleep is None else step_sleep
+    compress = config.BACKUP_COMPRESS if compress is None else compress
+    keep = keep or config.BACKUP_KEEP
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    # Microssegundos no nome: dois backups no mesmo segundo não se sobrescrevem
+    nome = f"{prefix}-{datetime.now():%Y%m%d-%H%M%S-%f}.db"
+    fd, tmp = tempfile.mkstemp(prefix=f".{nome}.", suffix=".tmp", dir=dest_dir)
+    os.close(fd)
+    tmp = Path(tmp)
+
+    try:
+        src = sqlite3.connect(db_path, timeout=30)
+        dst = sqlite3.connect(tmp)
+        try:
+            _copy(src, dst, pages, step_sleep)
+            _check_integrity(dst)
+        finally:
+            dst.close()
+            src.close()
+
+        if compress:
+            final = dest_dir / f"{nome}.gz"
+            with open(tmp, "rb") as f_in, gzip.open(f"{tmp}.gz", "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            tmp.unlink()
+            Path(f"{tmp}.gz").replace(final)
+        else:
+            final = dest_dir / nome
+            tmp.replace(final)
+    finally:
+        tmp.unlink(missing_ok=True)
+        Path(f"{tmp}.gz").unlink(missing_ok=True)
+
+    rotate(dest_dir, prefix, keep)
+    return final
+
+
+def list_backups(dest_dir, prefix="default"):
+    # Nome exato <prefix>-AAAAMMDD-HHMMSS[-ffffff].db[.gz]: o site "a" não pega
+    # backups do site "a-b". Timestamp no nome: ordem alfabética = cronológica
+    padrao = re.compile(rf"^{re.escape(prefix)}-\d{{8}}-\d{{6}}(-\d{{6}})?\.db(\.gz)?$")
+    dest_dir = Path(dest_dir)
+    return sorted((p for p in dest_dir.iterdir() if padrao.match(p.name)), key=lambda p: p.name)
+
+
+def rotate(dest_dir, prefix="default", keep=None):
+    keep = keep or config.BACKUP_KEEP
+    for antigo in list_backups(dest_dir, prefix)[:-keep]:
+        antigo.unlink(missing_ok=True)
+
+
+def restore_database(backup_file, db_path, pages=None):
+    """
+    Restaura um backup (.db ou .db.gz) sobre db_path.
+    Usa a API de backup no sentido inverso: a troca é transacional e as
+    conexões abertas passam a ver o conteúdo restaurado.
+    """
+    backup_file = Path(backup_file)
+    if not backup_file.exists():
+        raise FileNotFoundError(f"Backup não encontrado: {backup_file}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        origem = backup_file
+        if backup_file.suffix == ".gz":
+            origem = Path(tmpdir) / backup_file.stem
+            try:
+                with gzip.open(backup_file, "rb") as f_in, open(origem, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            except (OSError, EOFError) as e:
+                # gzip truncado/corrompido (BadGzipFile é um OSError) ou disco cheio
+                raise BackupError(f"não foi possível descompactar {backup_file.name}: {e}")
+
+        src = sqlite3.connect(origem)
+        try:
+            # Nunca sobrescreve o banco com um backup corrompido
+            _check_integrity(src)
+            dst = sqlite3.connect(db_path, timeout=30)
+            try:
+                src.backup(dst, pages=pages or -1)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+
+
+class BackupScheduler(threading.Thread):
+    """
+    Thread que faz backup de cada banco quando o último ficou mais velho
+    que o intervalo. Com vários workers, uma trava de arquivo garante que
+    só um faz o backup e os outros veem o arquivo novo e pulam.
+    """
+
+    def __init__(self, databases, dest_dir=None, interval_hours=None, check_seconds=60):
+        super().__init__(name="keeper-backup", daemon=True)
+        self.databases = databases  # {site: caminho do banco}
+        self.dest_dir = Path(dest_dir or config.BACKUP_DIR)
+        self.interval = (interval_hours or config.BACKUP_INTERVAL_HOURS) * 3600
+        self.check_seconds = check_seconds
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        # Primeira verificação logo no boot; depois a cada check_seconds
+        while True:
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Backup: erro no agendamento: {e}")
+            if self._stop_event.wait(self.check_seconds):
+                break
+
+    def _is_due(self, prefix):
+        existentes = list_backups(self.dest_dir, prefix)
+        if not existentes:
+            return True
+        return time.time() - existentes[-1].stat().st_mtime >= self.interval
+
+    def run_due(self):
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dest_dir / ".lock", "w") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # outro processo está fazendo backup agora
+            for site, db_path in self.databases.items():
+                if self._is_due(site):
+                    final = backup_database(db_path, self.dest_dir, prefix=site)
+                    print(f"Backup de {site} gravado em {final}")
+
+
+def start_scheduler(databases):
+    scheduler = BackupScheduler(databases)
+    scheduler.start()
+    return scheduler
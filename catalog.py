@@ -0,0 +1,156 @@
+"""
+Importação em lote do catálogo (itens e localizações) a partir de XLSX/CSV.
+
+As linhas são lidas em streaming (openpyxl em modo read_only / csv) e
+validadas antes de qualquer trava no banco; só então, numa transação
+curta, as chaves já existentes (UNIQUE(nome, tipo) / UNIQUE(nome)) são
+carregadas e as novas entram num único executemany.
+"""
+import csv
+import io
+import unicodedata
+
+
+class CatalogImportError(ValueError):
+    """Arquivo ilegível ou sem as colunas obrigatórias."""
+
+
+# Colunas aceitas por tabela: (obrigatórias, opcionais)
+COLUMNS = {
+    "itens": (("nome", "tipo"), ("descricao",)),
+    "localizacoes": (("nome",), ("descricao",)),
+}
+
+# Quantas linhas inválidas detalhar no resumo
+MAX_INVALID_DETAILS = 10
+
+
+def _cell(value):
+    # Normaliza célula: None -> "", 85.0 -> "85", texto sem espaços nas pontas
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _header(row):
+    # "Descrição" / " NOME " -> "descricao" / "nome"
+    nomes = []
+    for v in row:
+        h = unicodedata.normalize("NFKD", _cell(v).lower())
+        nomes.append("".join(ch for ch in h if not unicodedata.combining(ch)))
+    return nomes
+
+
+def _xlsx_rows(stream):
+    from openpyxl import load_workbook  # import tardio (pesado)
+
+    try:
+        wb = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise CatalogImportError(f"Não foi possível ler a planilha: {e}")
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _csv_rows(stream):
+    texto = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        amostra = texto.read(4096)
+        texto.seek(0)
+        try:
+            # Excel em pt-BR costuma salvar CSV com ';'
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.reader(texto, dialeto)
+    except UnicodeDecodeError:
+        raise CatalogImportError("CSV precisa estar em UTF-8.")
+
+
+def read_rows(stream, filename, table):
+    """
+    Gera (número da linha, dict coluna -> valor) a partir de um arquivo
+    .xlsx ou .csv. A primeira linha é o cabeçalho.
+    """
+    obrigatorias, opcionais = COLUMNS[table]
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "xlsx":
+        linhas = _xlsx_rows(stream)
+    elif ext == "csv":
+        linhas = _csv_rows(stream)
+    else:
+        raise CatalogImportError("Formato não suportado: envie um arquivo .xlsx ou .csv.")
+
+    cabecalho = _header(next(linhas, None) or ())
+    faltando = [c for c in obrigatorias if c not in cabecalho]
+    if faltando:
+        raise CatalogImportError(f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}.")
+    indices = {c: cabecalho.index(c) for c in obrigatorias + opcionais if c in cabecalho}
+
+    for numero, row in enumerate(linhas, start=2):
+        valores = {c: _cell(row[i]) if i < len(row) else "" for c, i in indices.items()}
+        if not any(valores.values()):
+            continue  # linha em branco
+        yield numero, valores
+
+
+def import_rows(db, table, rows):
+    """
+    Insere as linhas novas de 'table' numa só transação.
+    Retorna {"inseridos", "ignorados" (já cadastrados), "repetidos" (mais de
+    uma vez no arquivo), "invalidos": [(linha, motivo), ...]}.
+    """
+    obrigatorias, opcionais = COLUMNS[table]
+    chave = obrigatorias  # mesmas colunas do UNIQUE da tabela
+    colunas = obrigatorias + opcionais
+
+    resumo = {"inseridos": 0, "ignorados": 0, "repetidos": 0, "invalidos": []}
+    candidatos = {}
+
+    # Leitura e validação do arquivo inteiro antes de travar o banco
+    for numero, valores in rows:
+        vazias = [c for c in obrigatorias if not valores.get(c)]
+        if vazias:
+            resumo["invalidos"].append((numero, f"{', '.join(vazias)} em branco"))
+            continue
+        k = tuple(valores[c] for c in chave)
+        if k in candidatos:
+            resumo["repetidos"] += 1
+            continue
+        # Coluna opcional ausente no arquivo vira NULL, como no cadastro unitário
+        candidatos[k] = tuple(valores.get(c) for c in colunas)
+
+    # BEGIN IMMEDIATE: ninguém insere entre a leitura das chaves e o executemany
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        existentes = {tuple(r) for r in db.execute(f"SELECT {', '.join(chave)} FROM {table}")}
+        novos = [linha for k, linha in candidatos.items() if k not in existentes]
+        db.executemany(
+            f"INSERT INTO {table} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            novos
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    resumo["ignorados"] = len(candidatos) - len(novos)
+    resumo["inseridos"] = len(novos)
+    return resumo
+
+
+def summary_message(resumo):
+    # Texto do flash com o resultado da importação
+    msg = f"Importação concluída: {resumo['inseridos']} inserido(s), {resumo['ignorados']} já existente(s)"
+    if resumo["repetidos"]:
+        msg += f", {resumo['repetidos']} repetido(s) no arquivo"
+    invalidos = resumo["invalidos"]
+    if invalidos:
+        detalhes = "; ".join(f"linha {n}: {motivo}" for n, motivo in invalidos[:MAX_INVALID_DETAILS])
+        extra = "…" if len(invalidos) > MAX_INVALID_DETAILS else ""
+        msg += f", {len(invalidos)} inválido(s) ({detalhes}{extra})"
+    return msg + "."
@@ -3,4 +3,83 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).parent
 DB_FILE = os.getenv("KEEPER_DB", str(BASE_DIR / "keeper.db"))
-SECRET_KEY = os.getenv("KEEPER_SECRET", "keeper")
\ No newline at end of file
+SECRET_KEY = os.getenv("KEEPER_SECRET", "keeper")
+
+# ---------- Alertas de estoque ----------
+# Liga o dispatcher em background (a outbox é gravada mesmo com ele desligado)
+ALERTS_ENABLED = os.getenv("KEEPER_ALERTS", "0") == "1"
+# Destinos separados por vírgula: log, email, webhook
+ALERT_SINKS = [s.strip() for s in os.getenv("KEEPER_ALERT_SINKS", "log").split(",") if s.strip()]
+ALERT_LOG_FILE = os.getenv("KEEPER_ALERT_LOG", str(BASE_DIR / "alertas.log"))
+ALERT_SMTP_HOST = os.getenv("KEEPER_ALERT_SMTP_HOST", "localhost")
+ALERT_SMTP_PORT = int(os.getenv("KEEPER_ALERT_SMTP_PORT", "25"))
+ALERT_EMAIL_FROM = os.getenv("KEEPER_ALERT_EMAIL_FROM", "keeper@localhost")
+ALERT_EMAIL_TO = [s.strip() for s in os.getenv("KEEPER_ALERT_EMAIL_TO", "").split(",") if s.strip()]
+ALERT_WEBHOOK_URL = os.getenv("KEEPER_ALERT_WEBHOOK_URL", "")
+ALERT_POLL_SECONDS = float(os.getenv("KEEPER_ALERT_POLL", "10"))
+ALERT_MAX_ATTEMPTS = int(os.getenv("KEEPER_ALERT_MAX_ATTEMPTS", "5"))
+ALERT_BACKOFF_SECONDS = int(os.getenv("KEEPER_ALERT_BACKOFF", "30"))
+
+
+# ---------- Fila de escrita (group commit) ----------
+# Modo single-writer: POSTs de /movimentacao são gravados em lote por uma thread dedicada
+WRITE_QUEUE_ENABLED = os.getenv("KEEPER_WRITE_QUEUE", "0") == "1"
+WRITE_QUEUE_BATCH_SIZE = int(os.getenv("KEEPER_WRITE_QUEUE_BATCH", "32"))
+WRITE_QUEUE_MAX_LATENCY_MS = float(os.getenv("KEEPER_WRITE_QUEUE_LATENCY_MS", "5"))
+# Tempo máximo que a requisição espera o resultado antes de desistir
+WRITE_QUEUE_TIMEOUT = float(os.getenv("KEEPER_WRITE_QUEUE_TIMEOUT", "10"))
+
+
+# ---------- Multi-site ----------
+# Um banco por site: KEEPER_SITES="matriz=/dados/matriz.db,filial=/dados/filial.db"
+# Vazio = modo de site único (usa DB_FILE)
+SITES = dict(
+    (nome.strip(), caminho.strip())
+    for nome, caminho in (
+        par.split("=", 1) for par in os.getenv("KEEPER_SITES", "").split(",") if "=" in par
+    )
+)
+# Como escolher o site da requisição: subdomain, prefix (/<site>/...) ou user
+SITE_MODE = os.getenv("KEEPER_SITE_MODE", "subdomain")
+DEFAULT_SITE = os.getenv("KEEPER_DEFAULT_SITE") or None
+SITE_POOL_SIZE = int(os.getenv("KEEPER_SITE_POOL_SIZE", "8"))
+
+
+# ---------- Profiling de requisições ----------
+# Liga amostragem/endpoints; o header de admin funciona mesmo desligado
+PROFILING_ENABLED = os.getenv("KEEPER_PROFILING", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("KEEPER_PROFILE_SAMPLE", "0"))
+PROFILE_ENDPOINTS = [s.strip() for s in os.getenv("KEEPER_PROFILE_ENDPOINTS", "").split(",") if s.strip()]
+PROFILE_HEADER = "X-Keeper-Profile"
+PROFILE_DIR = os.getenv("KEEPER_PROFILE_DIR", str(BASE_DIR / "profiles"))
+PROFILE_KEEP = int(os.getenv("KEEPER_PROFILE_KEEP", "200"))
+
+
+# ---------- Boot dos workers ----------
+# Bytecode cache do Jinja em disco (vazio = desligado)
+TEMPLATE_CACHE_DIR = os.getenv("KEEPER_TEMPLATE_CACHE", str(BASE_DIR / ".jinja_cache"))
+# Carrega todos os templates no create_app (útil com gunicorn --preload;
+# seguro porque as threads de fundo só sobem depois do fork, por worker)
+TEMPLATE_WARMUP = os.getenv("KEEPER_TEMPLATE_WARMUP", "1") == "1"
+# Imprime o tempo de cada etapa do boot
+STARTUP_REPORT = os.getenv("KEEPER_STARTUP_REPORT", "0") == "1"
+
+
+# ---------- Backup online ----------
+BACKUP_ENABLED = os.getenv("KEEPER_BACKUP", "0") == "1"
+BACKUP_DIR = os.getenv("KEEPER_BACKUP_DIR", str(BASE_DIR / "backups"))
+BACKUP_INTERVAL_HOURS = float(os.getenv("KEEPER_BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_KEEP = int(os.getenv("KEEPER_BACKUP_KEEP", "7"))
+BACKUP_COMPRESS = os.getenv("KEEPER_BACKUP_COMPRESS", "1") == "1"
+# Páginas copiadas por passo e pausa (s) entre passos
+BACKUP_PAGES = int(os.getenv("KEEPER_BACKUP_PAGES", "64"))
+BACKUP_STEP_SLEEP = float(os.getenv("KEEPER_BACKUP_STEP_SLEEP", "0.05"))
+# Recomeços tolerados (escritas durante a cópia) antes de copiar num passo só
+BACKUP_MAX_RESTARTS = int(os.getenv("KEEPER_BACKUP_MAX_RESTARTS", "3"))
+
+
+# ---------- Relatórios ----------
+# Tempo máximo (s) das queries de relatório e de exportação Excel
+REPORT_TIME_BUDGET = float(os.getenv("KEEPER_REPORT_BUDGET", "5"))
+EXPORT_TIME_BUDGET = float(os.getenv("KEEPER_EXPORT_BUDGET", "30"))
+REPORT_POOL_SIZE = int(os.getenv("KEEPER_REPORT_POOL_SIZE", "4"))
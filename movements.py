@@ -0,0 +1,208 @@
+"""
+Aplicação de movimentações de estoque.
+
+- apply_movement(): regra única de entrada/saída (usada pela rota e pelo writer).
+- MovementWriter: modo "single-writer" opcional. As requisições enfileiram
+  movimentações já validadas e uma thread dedicada grava em pequenos lotes
+  dentro de uma só transação (group commit), devolvendo o resultado de cada
+  movimentação para a sua requisição.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import alerts
+import config
+
+
+class InsufficientStock(Exception):
+    """Saída maior que o estoque disponível (mensagem pronta para o flash)."""
+
+
+def apply_movement(db, nome, tipo, quantidade, movimento, usuario, localizacao=None):
+    """
+    Atualiza 'estoque', avalia alertas do item e registra em 'movimentacao'.
+    Não faz commit: quem chama controla a transação.
+    Levanta InsufficientStock se a saída deixaria o estoque negativo.
+    """
+    # atualiza estoque: se existe o registro, atualiza; se não existe e for entrada, cria
+    row = db.execute(
+        "SELECT id, quantidade FROM estoque WHERE nome = ? AND tipo = ?",
+        (nome, tipo)
+    ).fetchone()
+
+    if row:
+        # calcula nova quantidade dependendo do tipo de movimento
+        if movimento == "entrada":
+            nova_qtd = row[1] + quantidade
+        else:  # saida
+            nova_qtd = row[1] - quantidade
+
+        if nova_qtd < 0:
+            raise InsufficientStock("Não há estoque suficiente para esta saída.")
+
+        db.execute("UPDATE estoque SET quantidade = ? WHERE id = ?", (nova_qtd, row[0]))
+    else:
+        # não existe registro no estoque
+        if movimento == "saida":
+            raise InsufficientStock("Não há estoque desse item.")
+        nova_qtd = quantidade
+        db.execute(
+            "INSERT INTO estoque (nome, tipo, quantidade) VALUES (?, ?, ?)",
+            (nome, tipo, quantidade)
+        )
+
+    # avalia limites só deste item (alerta entra na outbox na mesma transação)
+    alerts.check_item(db, nome, tipo, nova_qtd)
+
+    # registra movimentação (guarda nome/tipo pra audit trail)
+    db.execute(
+        "INSERT INTO movimentacao (nome, tipo, quantidade, movimento, usuario, localizacao) VALUES (?, ?, ?, ?, ?, ?)",
+        (nome, tipo, quantidade, movimento, usuario, localizacao)
+    )
+    return nova_qtd
+
+
+class MovementWriter(threading.Thread):
+    """
+    Thread única de escrita de movimentações.
+    Junta até 'batch_size' movimentações, esperando no máximo 'max_latency'
+    segundos após a primeira, e grava todas com um único COMMIT. Cada
+    movimentação roda num SAVEPOINT próprio: uma saída sem estoque é
+    desfeita sozinha, sem derrubar o resto do lote.
+    """
+
+    def __init__(self, db_path, batch_size=None, max_latency=None, busy_timeout=None):
+        super().__init__(name="keeper-writer", daemon=True)
+        self.db_path = db_path
+        # Espera máxima pelo lock do banco: limita quanto um lote já iniciado pode durar
+        self.busy_timeout = busy_timeout or config.WRITE_QUEUE_TIMEOUT
+        self.batch_size = batch_size or config.WRITE_QUEUE_BATCH_SIZE
+        self.max_latency = (max_latency if max_latency is not None
+                            else config.WRITE_QUEUE_MAX_LATENCY_MS / 1000.0)
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def submit(self, nome, tipo, quantidade, movimento, usuario, localizacao=None):
+        """Enfileira uma movimentação validada; devolve um Future com a nova quantidade."""
+        fut = Future()
+        self._queue.put((fut, (nome, tipo, quantidade, movimento, usuario, localizacao)))
+        return fut
+
+    def apply(self, nome, tipo, quantidade, movimento, usuario, localizacao=None, timeout=None):
+        """
+        Enfileira e espera o resultado. Se o prazo estourar antes do lote
+        começar, a movimentação é cancelada e levanta FutureTimeout; se já
+        estiver sendo gravada, espera o desfecho real por no máximo
+        busy_timeout (o lote desiste do lock nesse prazo), então a espera
+        total nunca passa de timeout + busy_timeout.
+        """
+        fut = self.submit(nome, tipo, quantidade, movimento, usuario, localizacao)
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            if fut.cancel():
+                raise
+            return fut.result(timeout=self.busy_timeout + 1)
+
+    def stop(self):
+        self._stop_event.set()
+        self._queue.put(None)
+
+    def _connect(self):
+        # isolation_level=None: transação controlada manualmente (BEGIN/SAVEPOINT/COMMIT)
+        con = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        con.execute("PRAGMA foreign_keys = ON;")
+        return con
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def run(self):
+        con = None
+        try:
+            while not self._stop_event.is_set():
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    if con is None:
+                        con = self._connect()
+                    self._write_batch(con, batch)
+                except Exception as e:
+                    # Conexão em estado desconhecido (ex.: ROLLBACK falhou):
+                    # responde o lote e reabre a conexão no próximo
+                    print(f"Writer: erro no lote, reabrindo a conexão: {e}")
+                    _fail_batch(batch, e)
+                    if con is not None:
+                        con.close()
+                    con = None
+        finally:
+            if con is not None:
+                con.close()
+
+    def _write_batch(self, con, batch):
+        results = []
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            for fut, args in batch:
+                if not fut.set_running_or_notify_cancel():
+                    results.append((fut, None))
+                    continue
+                con.execute("SAVEPOINT mov")
+                try:
+                    results.append((fut, apply_movement(con, *args)))
+                    con.execute("RELEASE SAVEPOINT mov")
+                except Exception as e:
+                    con.execute("ROLLBACK TO SAVEPOINT mov")
+                    con.execute("RELEASE SAVEPOINT mov")
+                    results.append((fut, e))
+            con.execute("COMMIT")
+        except Exception as e:
+            # Falha no lote inteiro (ex.: banco bloqueado): ninguém foi gravado.
+            # Responde antes do ROLLBACK, que também pode falhar
+            _fail_batch(batch, e)
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            return
+
+        # Resultados só são entregues depois do COMMIT
+        for fut, res in results:
+            if isinstance(res, Exception):
+                fut.set_exception(res)
+            elif fut.running():
+                fut.set_result(res)
+
+
+def _fail_batch(batch, exc):
+    # Entrega o erro real a todos que ainda esperam, inclusive os que o
+    # lote nem chegou a iniciar (ex.: BEGIN IMMEDIATE estourou o busy_timeout)
+    for fut, _ in batch:
+        if fut.done():
+            continue
+        if fut.running() or fut.set_running_or_notify_cancel():
+            fut.set_exception(exc)
+
+
+def start_writer(db_path):
+    writer = MovementWriter(db_path)
+    writer.start()
+    return writer
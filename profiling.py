@@ -0,0 +1,129 @@
+"""
+Profiling sob demanda de requisições em produção.
+
+Uma requisição é perfilada (cProfile) quando:
+- um admin logado envia o header X-Keeper-Profile: 1; ou
+- KEEPER_PROFILING=1 e o endpoint está em KEEPER_PROFILE_ENDPOINTS; ou
+- KEEPER_PROFILING=1 e ela cai na amostragem (KEEPER_PROFILE_SAMPLE).
+
+Cada perfil vira um .prof (formato pstats) + um .json com o resumo, num
+diretório com rotação (mantém só os KEEPER_PROFILE_KEEP mais recentes).
+"""
+import cProfile
+import json
+import pstats
+import random
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from flask import g, request, session
+
+import config
+
+
+class RequestProfiler:
+
+    def __init__(self, app=None, directory=None, sample_rate=None, endpoints=None, keep=None):
+        self.directory = Path(directory or config.PROFILE_DIR)
+        self.sample_rate = sample_rate if sample_rate is not None else config.PROFILE_SAMPLE_RATE
+        self.endpoints = set(endpoints if endpoints is not None else config.PROFILE_ENDPOINTS)
+        self.keep = keep or config.PROFILE_KEEP
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+        app.extensions["profiler"] = self
+
+    def _should_profile(self):
+        if request.endpoint in (None, "static"):
+            return False
+        # Header só vale para admin: ninguém mais consegue forçar o custo do profiler
+        if request.headers.get(config.PROFILE_HEADER) == "1" and session.get("role") == "admin":
+            return True
+        if not config.PROFILING_ENABLED:
+            return False
+        if request.endpoint in self.endpoints:
+            return True
+        return random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._should_profile():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outro profiler já ativo nesta thread (ex.: depurador)
+            return
+        g._profiler = (profiler, time.perf_counter())
+
+    def _stop(self, exc=None):
+        started = g.pop("_profiler", None)
+        if started is None:
+            return
+        profiler, t0 = started
+        profiler.disable()
+        duracao_ms = (time.perf_counter() - t0) * 1000
+        try:
+            self._save(profiler, duracao_ms, exc)
+        except OSError as e:
+            print(f"Profiler: não foi possível gravar o perfil: {e}")
+
+    def _save(self, profiler, duracao_ms, exc):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        agora = datetime.now()
+        base = f"{agora:%Y%m%d-%H%M%S-%f}_{request.endpoint}_{uuid.uuid4().hex[:6]}"
+
+        profiler.dump_stats(str(self.directory / f"{base}.prof"))
+        resumo = {
+            "arquivo": f"{base}.prof",
+            "datahora": agora.isoformat(sep=" ", timespec="seconds"),
+            "endpoint": request.endpoint,
+            "metodo": request.method,
+            "caminho": request.full_path.rstrip("?"),
+            "usuario": session.get("username"),
+            "duracao_ms": round(duracao_ms, 2),
+            "erro": repr(exc) if exc else None,
+            "top_funcoes": top_functions(profiler),
+        }
+        with open(self.directory / f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False)
+        self._rotate()
+
+    def _rotate(self):
+        # Nome começa com timestamp: ordem alfabética = ordem cronológica
+        resumos = sorted(self.directory.glob("*.json"))
+        for antigo in resumos[:-self.keep]:
+            antigo.with_suffix(".prof").unlink(missing_ok=True)
+            antigo.unlink(missing_ok=True)
+
+    def slowest(self, limit=50):
+        """Resumos dos perfis capturados, do mais lento para o mais rápido."""
+        resumos = []
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    resumos.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # arquivo removido pela rotação ou ainda sendo escrito
+        resumos.sort(key=lambda r: r["duracao_ms"], reverse=True)
+        return resumos[:limit]
+
+
+def top_functions(profiler, limit=10):
+    # Funções com maior tempo próprio (tottime), já no formato do template
+    stats = pstats.Stats(profiler).stats
+    linhas = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:limit]
+    return [
+        {
+            "funcao": pstats.func_std_string(func),
+            "chamadas": nc,
+            "tempo_proprio_ms": round(tt * 1000, 2),
+            "tempo_acumulado_ms": round(ct * 1000, 2),
+        }
+        for func, (cc, nc, tt, ct, callers) in linhas
+    ]
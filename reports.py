@@ -0,0 +1,51 @@
+"""
+Conexões de leitura isoladas e com tempo limitado para relatórios.
+
+Relatórios e exportações usam um pool próprio, só leitura (mode=ro +
+PRAGMA query_only), e cada uso roda num snapshot de leitura com prazo:
+um progress handler interrompe a query quando o prazo estoura, então um
+relatório pesado não segura a transação de leitura (nem o checkpoint)
+indefinidamente. O isolamento conta com o banco em WAL (init_db liga):
+em WAL o snapshot não bloqueia os writers.
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+class ReportTimeout(Exception):
+    """Relatório cancelado por estourar o tempo limite."""
+
+
+# Quantas instruções da VM do SQLite entre cada checagem do prazo
+PROGRESS_STEPS = 10000
+
+
+@contextmanager
+def read_snapshot(pool, seconds):
+    """
+    Empresta uma conexão só leitura do pool e abre um snapshot (BEGIN)
+    que dura até o fim do bloco. Levanta ReportTimeout se as queries do
+    bloco passarem de 'seconds' segundos.
+    """
+    deadline = time.monotonic() + seconds
+    try:
+        con = pool.acquire(timeout=seconds)
+    except sqlite3.OperationalError:
+        raise ReportTimeout("muitos relatórios em andamento")
+
+    def progress():
+        # Valor diferente de zero faz o SQLite abortar a query (interrupted)
+        return 1 if time.monotonic() > deadline else 0
+
+    con.set_progress_handler(progress, PROGRESS_STEPS)
+    try:
+        con.execute("BEGIN")
+        yield con
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            raise ReportTimeout(f"tempo limite de {seconds:g}s excedido") from e
+        raise
+    finally:
+        con.set_progress_handler(None, 0)
+        pool.release(con)  # release faz rollback do snapshot
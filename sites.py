@@ -0,0 +1,214 @@
+"""
+Multi-site: um banco SQLite por site (unidade) atrás de um roteador.
+
+- SiteRouter escolhe o site de cada requisição por subdomínio, prefixo de
+  URL (/<site>/...) ou atributo do usuário (site em que usuário e senha conferem).
+- Cada site tem seu próprio pool de conexões.
+- aggregate() consulta todos os sites em paralelo e junta estoque e consumo.
+"""
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from werkzeug.security import check_password_hash
+
+import config
+
+
+class ConnectionPool:
+    """Pool simples de conexões para um arquivo SQLite (opcionalmente só leitura)."""
+
+    def __init__(self, db_path, size=None, timeout=30, read_only=False):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size or config.SITE_POOL_SIZE)
+
+    def _connect(self):
+        # check_same_thread=False: a conexão volta ao pool e pode ser usada por outra thread
+        if self.read_only:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            con = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+            con.execute("PRAGMA query_only = ON;")  # Garantia extra: nenhuma escrita passa
+        else:
+            con = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            con.execute("PRAGMA foreign_keys = ON;")  # Garante integridade referencial
+        con.row_factory = sqlite3.Row  # Permite acessar colunas por nome
+        return con
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=self.timeout if timeout is None else timeout):
+            raise sqlite3.OperationalError(f"Pool de conexões esgotado para {self.db_path}")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, con):
+        try:
+            # Nunca devolve conexão com transação pendurada
+            if con.in_transaction:
+                con.rollback()
+            self._idle.put(con)
+        except sqlite3.Error:
+            con.close()
+        finally:
+            self._slots.release()
+
+
+class AmbiguousLogin(Exception):
+    """Usuário e senha conferem em mais de um site: o login precisa dizer qual."""
+
+    def __init__(self, sites):
+        super().__init__(f"Conta encontrada nos sites: {', '.join(sites)}")
+        self.sites = sites
+
+
+class SiteRouter:
+    """Resolve o site da requisição e entrega conexões do pool correspondente."""
+
+    MODES = ("subdomain", "prefix", "user")
+
+    def __init__(self, sites, mode=None, default=None, pool_size=None):
+        if not sites:
+            raise ValueError("Nenhum site configurado (KEEPER_SITES)")
+        self.mode = mode or config.SITE_MODE
+        if self.mode not in self.MODES:
+            raise ValueError(f"Modo de roteamento inválido: {self.mode}")
+        self.sites = dict(sites)
+        self.default = default or next(iter(self.sites))
+        if self.default not in self.sites:
+            raise ValueError(f"Site padrão desconhecido: {self.default}")
+        self.pools = {name: ConnectionPool(path, pool_size) for name, path in self.sites.items()}
+
+    def resolve(self, request, session):
+        # Descobre o site da requisição; cai no site padrão se nada casar
+        if self.mode == "subdomain":
+            site = request.host.split(":")[0].split(".")[0]
+        elif self.mode == "prefix":
+            site = request.environ.get("keeper.site")
+        else:
+            site = session.get("site")
+        return site if site in self.sites else self.default
+
+    def acquire(self, site):
+        return self.pools[site].acquire()
+
+    def release(self, site, con):
+        self.pools[site].release(con)
+
+    def _check_login(self, name, username, password):
+        con = self.acquire(name)
+        try:
+            row = con.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        finally:
+            self.release(name, con)
+        if row is not None and check_password_hash(row["password_hash"], password):
+            return row
+        return None
+
+    def authenticate(self, username, password, site=None):
+        """
+        Modo 'user': devolve (site, linha do usuário) da conta cuja senha
+        confere, ou (None, None). O mesmo usuário pode existir em vários
+        bancos (o schema cria admin/keeper em todos): vale o site escolhido
+        no login, depois o site padrão; se a senha conferir em mais de um
+        dos outros sites, levanta AmbiguousLogin.
+        """
+        if site in self.sites:
+            row = self._check_login(site, username, password)
+            return (site, row) if row is not None else (None, None)
+
+        # Site padrão primeiro: no caso comum resolve com um hash só
+        row = self._check_login(self.default, username, password)
+        if row is not None:
+            return self.default, row
+        encontrados = []
+        for name in self.sites:
+            if name == self.default:
+                continue
+            row = self._check_login(name, username, password)
+            if row is not None:
+                encontrados.append((name, row))
+        if len(encontrados) > 1:
+            raise AmbiguousLogin([name for name, _ in encontrados])
+        return encontrados[0] if encontrados else (None, None)
+
+    def wsgi_middleware(self, wsgi_app):
+        """
+        Modo 'prefix': tira /<site> do PATH_INFO e move para SCRIPT_NAME,
+        assim as rotas não mudam e o url_for já gera links com o prefixo.
+        """
+        sites = self.sites
+
+        def middleware(environ, start_response):
+            path = environ.get("PATH_INFO", "")
+            first = path.lstrip("/").split("/", 1)[0]
+            if first in sites:
+                environ["keeper.site"] = first
+                environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + "/" + first
+                environ["PATH_INFO"] = path[len(first) + 1:] or "/"
+            return wsgi_app(environ, start_response)
+
+        return middleware
+
+    # ---------- Visão consolidada ----------
+    def _query_site(self, name, data_inicio, data_fim):
+        con = self.acquire(name)
+        try:
+            estoque = con.execute("SELECT nome, tipo, quantidade FROM estoque").fetchall()
+            consumo = con.execute(
+                """
+                SELECT nome, tipo, SUM(quantidade) AS total
+                FROM movimentacao
+                WHERE movimento = 'saida' AND date(datahora) >= date(?) AND date(datahora) <= date(?)
+                GROUP BY nome, tipo
+                """,
+                (data_inicio, data_fim)
+            ).fetchall()
+            return [tuple(r) for r in estoque], [tuple(r) for r in consumo]
+        finally:
+            self.release(name, con)
+
+    def aggregate(self, data_inicio, data_fim):
+        """
+        Consulta todos os sites em paralelo e junta por (nome, tipo).
+        Retorna (linhas, sites_com_erro); um site fora do ar não derruba a visão.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.sites)) as pool:
+            futures = {
+                name: pool.submit(self._query_site, name, data_inicio, data_fim)
+                for name in self.sites
+            }
+
+        linhas = {}
+        erros = {}
+        for name, fut in futures.items():
+            try:
+                estoque, consumo = fut.result()
+            except Exception as e:
+                erros[name] = str(e)
+                continue
+            for nome, tipo, qtd in estoque:
+                linha = linhas.setdefault((nome, tipo), _linha_vazia(nome, tipo))
+                linha["estoque"][name] = qtd
+                linha["total_estoque"] += qtd
+            for nome, tipo, qtd in consumo:
+                linha = linhas.setdefault((nome, tipo), _linha_vazia(nome, tipo))
+                linha["consumo"][name] = qtd
+                linha["total_consumo"] += qtd
+
+        ordenadas = sorted(linhas.values(), key=lambda l: (l["tipo"], l["nome"]))
+        return ordenadas, erros
+
+
+def _linha_vazia(nome, tipo):
+    return {"nome": nome, "tipo": tipo, "estoque": {}, "consumo": {},
+            "total_estoque": 0, "total_consumo": 0}
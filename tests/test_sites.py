@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import sites
+
+
+def _make_site(path, users):
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, "
+        "password_hash TEXT, role TEXT)"
+    )
+    for username, password in users:
+        con.execute(
+            "INSERT INTO users (username, password_hash, role) VALUES (?, ?, 'admin')",
+            (username, generate_password_hash(password)),
+        )
+    con.commit()
+    con.close()
+    return str(path)
+
+
+@pytest.fixture
+def two_sites(tmp_path):
+    # Dois bancos novos: o schema cria admin/keeper nos dois
+    return {
+        "matriz": _make_site(tmp_path / "m.db", [("admin", "keeper"), ("ana", "a")]),
+        "filial": _make_site(tmp_path / "f.db", [("admin", "keeper"), ("bia", "b")]),
+    }
+
+
+def test_same_account_on_two_sites_uses_default(two_sites):
+    router = sites.SiteRouter(two_sites, mode="user")
+    site, row = router.authenticate("admin", "keeper")
+    assert site == "matriz"
+    assert row["username"] == "admin"
+
+
+def test_same_account_on_two_sites_honours_chosen_site(two_sites):
+    router = sites.SiteRouter(two_sites, mode="user")
+    site, row = router.authenticate("admin", "keeper", site="filial")
+    assert site == "filial"
+    assert row is not None
+
+
+def test_account_on_one_site(two_sites):
+    router = sites.SiteRouter(two_sites, mode="user")
+    assert router.authenticate("bia", "b")[0] == "filial"
+    assert router.authenticate("bia", "errada") == (None, None)
+    assert router.authenticate("bia", "b", site="matriz") == (None, None)
+
+
+def test_ambiguous_outside_default_site(tmp_path):
+    router = sites.SiteRouter({
+        "matriz": _make_site(tmp_path / "m.db", []),
+        "filial": _make_site(tmp_path / "f.db", [("admin", "keeper")]),
+        "deposito": _make_site(tmp_path / "d.db", [("admin", "keeper")]),
+    }, mode="user")
+    with pytest.raises(sites.AmbiguousLogin) as exc:
+        router.authenticate("admin", "keeper")
+    assert exc.value.sites == ["filial", "deposito"]